@@ -8,6 +8,9 @@ from feast import (
 )
 from feast.types import Float32, Int64, String
 from feast.value_type import ValueType
+from sentinel.utils.feature_pipeline import PACKET_STATS_SCHEMA
+
+FEAST_TYPES = {"float32": Float32, "string": String}
 
 # Define entity
 packet = Entity(
@@ -23,6 +26,13 @@ packet_batch_source = FileSource(
     timestamp_field="event_timestamp",
 )
 
+# Define live history source (date/hour partitioned by sentinel.utils.history_store)
+packet_history_source = FileSource(
+    name="packet_history_source",
+    path="../data/history",
+    timestamp_field="event_timestamp",
+)
+
 # Define push source (for serving)
 packet_push_source = PushSource(
     name="packet_push_source",
@@ -34,17 +44,21 @@ packet_features = FeatureView(
     name="packet_stats",
     entities=[packet],
     ttl=timedelta(days=1),
-    schema=[
-        Field(name="src_bytes", dtype=Float32),
-        Field(name="dst_bytes", dtype=Float32),
-        Field(name="duration", dtype=Float32),
-        Field(name="count", dtype=Float32),
-        Field(name="srv_count", dtype=Float32),
-        Field(name="protocol_type", dtype=String),
-        Field(name="service", dtype=String),
-        Field(name="flag", dtype=String),
-    ],
+    #? Schema lives in sentinel.utils.feature_pipeline so training and serving share it
+    schema=[Field(name=name, dtype=FEAST_TYPES[dtype]) for name, dtype in PACKET_STATS_SCHEMA],
     online=True,  #? Enable syncing to Redis
     source=packet_push_source,
     tags={"team": "security"},
-)
\ No newline at end of file
+)
+
+# Define live history feature view (offline retrieval over the partitioned live traffic)
+#? History only stores the numeric model inputs, so this view carries the float32 fields
+packet_history_features = FeatureView(
+    name="packet_history_stats",
+    entities=[packet],
+    ttl=timedelta(days=1),
+    schema=[Field(name=name, dtype=FEAST_TYPES[dtype]) for name, dtype in PACKET_STATS_SCHEMA if dtype == "float32"],
+    online=False,
+    source=packet_history_source,
+    tags={"team": "security"},
+)
@@ -0,0 +1,242 @@
+import os
+import csv
+import time
+import queue
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import Counter as SourceCounter
+from prometheus_client import Counter
+from sentinel.logger import get_logger
+
+logger = get_logger("AlertAggregator")
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+ALERTS_PATH = BASE_DIR / "data" / "alerts.csv"
+
+ALERT_WINDOW_SECONDS = float(os.getenv("ALERT_WINDOW_SECONDS", "30"))
+#? Groups with fewer anomalies than this in a window are treated as noise
+ALERT_SUPPRESS_BELOW = int(os.getenv("ALERT_SUPPRESS_BELOW", "1"))
+ALERT_ESCALATE_AT = int(os.getenv("ALERT_ESCALATE_AT", "100"))
+#? A group already alerted on stays quiet this long unless it escalates
+ALERT_QUIET_SECONDS = float(os.getenv("ALERT_QUIET_SECONDS", "300"))
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))
+#! Spoofed floods use a new source per packet, so per-group source tracking is capped
+ALERT_MAX_TRACKED_SOURCES = int(os.getenv("ALERT_MAX_TRACKED_SOURCES", "1000"))
+ALERT_TOP_SOURCES = 5
+
+ALERT_COLUMNS = [
+    "timestamp", "severity", "service", "flag", "count", "distinct_sources", "top_sources",
+    "first_seen", "last_seen", "last_packet_id", "suppressed_windows"
+]
+
+ALERTS_EMITTED = Counter("sentinel_alerts_emitted", "Summarized alerts written", ["severity"])
+ALERTS_SUPPRESSED = Counter("sentinel_alerts_suppressed", "Alert windows suppressed by threshold or quiet period")
+ALERTS_DROPPED = Counter("sentinel_alerts_dropped", "Alerts dropped because the write channel was full")
+ANOMALIES_RECORDED = Counter("sentinel_anomalies_recorded", "Anomalous packets folded into alert groups")
+
+
+class AlertGroup:
+    __slots__ = ("count", "first_seen", "last_seen", "last_packet_id", "sources", "sources_overflowed")
+
+    def __init__(self, now: float):
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_packet_id = None
+        self.sources = SourceCounter()
+        self.sources_overflowed = False
+
+    def add_source(self, source: str, count: int = 1):
+        if source in self.sources or len(self.sources) < ALERT_MAX_TRACKED_SOURCES:
+            self.sources[source] += count
+        else:
+            self.sources_overflowed = True
+
+    def merge(self, other):
+        self.count += other.count
+        self.first_seen = min(self.first_seen, other.first_seen)
+        if other.count:
+            self.last_seen = max(self.last_seen, other.last_seen)
+            self.last_packet_id = other.last_packet_id or self.last_packet_id
+        for source, count in other.sources.items():
+            self.add_source(source, count)
+        self.sources_overflowed = self.sources_overflowed or other.sources_overflowed
+
+
+class AlertAggregator:
+    """
+    Folds anomalies into one group per (service, flag) and emits a single
+    summary per group when its window closes. Sources are counted inside the
+    group rather than keyed on, since a flood rotates them per packet. Summaries go through a
+    bounded queue to a writer thread, so a flood never blocks the hot path.
+    """
+
+    def __init__(
+        self,
+        alerts_path=ALERTS_PATH,
+        window_seconds: float = ALERT_WINDOW_SECONDS,
+        suppress_below: int = ALERT_SUPPRESS_BELOW,
+        escalate_at: int = ALERT_ESCALATE_AT,
+        quiet_seconds: float = ALERT_QUIET_SECONDS,
+        queue_size: int = ALERT_QUEUE_SIZE
+    ):
+        self.alerts_path = Path(alerts_path)
+        self.window_seconds = window_seconds
+        self.suppress_below = suppress_below
+        self.escalate_at = escalate_at
+        self.quiet_seconds = quiet_seconds
+
+        self.groups = {}
+        self.last_emitted = {}  # key -> (emitted_at, severity)
+        self.suppressed = {}  # key -> (AlertGroup carried over, windows suppressed since last emit)
+        self._lock = threading.Lock()
+        self._next_flush = 0.0
+
+        self.channel = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def record(self, source: str, service: str, flag: str, packet_id: str, now: float = None):
+        now = now or time.time()
+        key = (service, flag)
+
+        if now >= self._next_flush:
+            self.flush(now)
+
+        with self._lock:
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = AlertGroup(now)
+
+            group.count += 1
+            group.last_seen = now
+            group.last_packet_id = packet_id
+            group.add_source(source)
+
+        ANOMALIES_RECORDED.inc()
+
+    def flush(self, now: float = None, force: bool = False):
+        """Closes every group whose window has elapsed (or all of them when forced)."""
+        now = now or time.time()
+
+        with self._lock:
+            self._next_flush = now + self.window_seconds
+            closed = [
+                (key, group) for key, group in self.groups.items()
+                if force or now - group.first_seen >= self.window_seconds
+            ]
+            for key, _ in closed:
+                del self.groups[key]
+
+            alerts = [self._summarize(key, group, now, force) for key, group in closed]
+
+            #? Carry-over whose quiet period has ended (or everything on close) goes out on its own
+            for key in [key for key in self.suppressed if key not in self.groups]:
+                if force or now - self.last_emitted[key][0] >= self.quiet_seconds:
+                    carry, _ = self.suppressed[key]
+                    alerts.append(self._summarize(key, AlertGroup(carry.first_seen), now, force=True))
+
+            alerts = [alert for alert in alerts if alert]
+
+            # Forget groups whose quiet period is over and that have nothing pending
+            for key in [key for key, (emitted_at, _) in self.last_emitted.items() if now - emitted_at >= self.quiet_seconds]:
+                if key not in self.groups and key not in self.suppressed:
+                    del self.last_emitted[key]
+
+        for alert in alerts:
+            try:
+                self.channel.put_nowait(alert)
+            except queue.Full:
+                ALERTS_DROPPED.inc()
+
+    def _carry_over(self, key, group: AlertGroup):
+        carry, windows = self.suppressed.get(key, (None, 0))
+        if carry is None:
+            carry = AlertGroup(group.first_seen)
+
+        carry.merge(group)
+        self.suppressed[key] = (carry, windows + 1)
+
+    def _summarize(self, key, group: AlertGroup, now: float, force: bool = False):
+        carry, windows = self.suppressed.get(key, (None, 0))
+        if group.count < self.suppress_below and carry is None:
+            ALERTS_SUPPRESSED.inc()
+            return None
+
+        severity = "critical" if group.count >= self.escalate_at else "warning"
+
+        # Quiet period: repeat alerts for the same group are folded into the next one
+        previous = self.last_emitted.get(key)
+        if previous is not None and not force:
+            emitted_at, previous_severity = previous
+            escalated = severity == "critical" and previous_severity != "critical"
+            if now - emitted_at < self.quiet_seconds and not escalated:
+                self._carry_over(key, group)
+                ALERTS_SUPPRESSED.inc()
+                return None
+
+        if carry is not None:
+            del self.suppressed[key]
+            carry.merge(group)
+            group = carry
+            severity = "critical" if group.count >= self.escalate_at else severity
+
+        self.last_emitted[key] = (now, severity)
+        service, flag = key
+        distinct_sources = len(group.sources)
+        return {
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "severity": severity,
+            "service": service,
+            "flag": flag,
+            "count": group.count,
+            "distinct_sources": f"{distinct_sources}+" if group.sources_overflowed else distinct_sources,
+            "top_sources": "|".join(f"{source}:{count}" for source, count in group.sources.most_common(ALERT_TOP_SOURCES)),
+            "first_seen": datetime.fromtimestamp(group.first_seen).isoformat(),
+            "last_seen": datetime.fromtimestamp(group.last_seen).isoformat(),
+            "last_packet_id": group.last_packet_id,
+            "suppressed_windows": windows
+        }
+
+    def _write_alert(self, alert: dict):
+        message = (
+            f"ALERT [{alert['severity'].upper()}] {alert['count']} anomalies on {alert['service']}/{alert['flag']} "
+            f"from {alert['distinct_sources']} sources (top: {alert['top_sources']}) "
+            f"between {alert['first_seen']} and {alert['last_seen']}"
+        )
+        if alert["severity"] == "critical":
+            logger.critical(message)
+        else:
+            logger.error(message)
+
+        try:
+            file_exists = self.alerts_path.is_file()
+            with open(self.alerts_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=ALERT_COLUMNS)
+                if not file_exists:
+                    writer.writeheader()
+                writer.writerow(alert)
+        except Exception as e:
+            logger.error(f"Failed to write alert: {e}")
+
+        ALERTS_EMITTED.labels(severity=alert["severity"]).inc()
+
+    def _write_loop(self):
+        while True:
+            try:
+                alert = self.channel.get(timeout=self.window_seconds)
+            except queue.Empty:
+                #? Close windows even when anomalies stop arriving
+                self.flush()
+                continue
+
+            if alert is None:
+                return
+
+            self._write_alert(alert)
+
+    def close(self):
+        self.flush(force=True)
+        self.channel.put(None)  # Writer exits once everything before it is written
+        self._writer.join()
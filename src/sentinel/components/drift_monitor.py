@@ -0,0 +1,309 @@
+import os
+import json
+import time
+from pathlib import Path
+from collections import deque
+import numpy as np
+import pandas as pd
+from prometheus_client import Gauge
+from sentinel.logger import get_logger
+
+logger = get_logger("DriftMonitor")
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_DIR = BASE_DIR / "data"
+REFERENCE_DATA_PATH = DATA_DIR / "kdd_train.parquet"
+REFERENCE_SKETCH_PATH = DATA_DIR / "drift_reference.json"
+DRIFT_STATE_PATH = DATA_DIR / "drift_state.json"
+
+#? Only the heavy-tailed numeric inputs are worth watching
+MONITORED_FEATURES = ["src_bytes", "dst_bytes", "duration", "count"]
+
+NUM_BINS = int(os.getenv("DRIFT_NUM_BINS", "20"))
+WINDOW_SECONDS = int(os.getenv("DRIFT_WINDOW_SECONDS", "900"))
+BUCKET_SECONDS = int(os.getenv("DRIFT_BUCKET_SECONDS", "60"))
+EVALUATE_EVERY = int(os.getenv("DRIFT_EVALUATE_EVERY", "200"))
+MIN_WINDOW_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "500"))
+#? PSI rule of thumb: < 0.1 stable, 0.1 - 0.2 moderate, > 0.2 significant shift
+DRIFT_THRESHOLD = float(os.getenv("DRIFT_THRESHOLD", "0.2"))
+
+DRIFT_SCORE = Gauge(
+    "sentinel_feature_drift_psi",
+    "Population stability index of the live window against the training reference",
+    ["feature"]
+)
+WINDOW_SAMPLES = Gauge(
+    "sentinel_drift_window_samples",
+    "Number of live samples in the current drift window",
+    ["feature"]
+)
+DRIFT_DETECTED = Gauge(
+    "sentinel_drift_detected",
+    "1 if any monitored feature is above the drift threshold"
+)
+
+
+class HistogramSketch:
+    """
+    Fixed-edge histogram. Sketches sharing the same edges merge (and un-merge)
+    by adding counts, so windows can be combined across time and processes.
+    """
+
+    def __init__(self, edges, counts=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if counts is None:
+            self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        else:
+            self.counts = np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values, num_bins: int = NUM_BINS):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+
+        # Interior cut points at reference quantiles (equal-mass bins)
+        #! Skewed features (mostly 0 bytes) produce duplicate quantiles, so dedupe
+        quantiles = np.linspace(0, 1, num_bins + 1)[1:-1]
+        edges = np.unique(np.quantile(values, quantiles)) if len(values) else np.array([])
+
+        sketch = cls(edges)
+        sketch.update_many(values)
+        return sketch
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def update(self, value: float):
+        self.counts[np.searchsorted(self.edges, value, side="right")] += 1
+
+    def update_many(self, values):
+        idx = np.searchsorted(self.edges, np.asarray(values, dtype=np.float64), side="right")
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def _check_compatible(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot combine sketches with different bin edges")
+
+    def merge(self, other):
+        self._check_compatible(other)
+        self.counts += other.counts
+        return self
+
+    def subtract(self, other):
+        self._check_compatible(other)
+        self.counts -= other.counts
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper edge of the bin holding the q-th sample."""
+        if self.total == 0 or len(self.edges) == 0:
+            return float("nan")
+        target = q * self.total
+        idx = int(np.searchsorted(np.cumsum(self.counts), target, side="left"))
+        return float(self.edges[min(idx, len(self.edges) - 1)])
+
+    def proportions(self, eps: float = 1e-4):
+        total = max(self.total, 1)
+        return np.clip(self.counts / total, eps, None)
+
+    def to_dict(self) -> dict:
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["edges"], data["counts"])
+
+
+def population_stability_index(reference: HistogramSketch, live: HistogramSketch) -> float:
+    expected = reference.proportions()
+    actual = live.proportions()
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class SlidingWindowSketch:
+    """
+    Keeps one sketch per time bucket plus their running merge. Expiring a
+    bucket subtracts it from the merge, so evaluation never rescans history.
+    """
+
+    def __init__(self, edges, window_seconds: int = WINDOW_SECONDS, bucket_seconds: int = BUCKET_SECONDS):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.buckets = deque()  # (bucket_start, HistogramSketch)
+        self.window = HistogramSketch(self.edges)
+
+    def expire(self, now: float):
+        while self.buckets and self.buckets[0][0] <= now - self.window_seconds:
+            _, old = self.buckets.popleft()
+            self.window.subtract(old)
+
+    def add(self, value: float, now: float):
+        self.expire(now)
+
+        bucket_start = now - (now % self.bucket_seconds)
+        if not self.buckets or self.buckets[-1][0] != bucket_start:
+            self.buckets.append((bucket_start, HistogramSketch(self.edges)))
+
+        self.buckets[-1][1].update(value)
+        self.window.update(value)
+
+
+def build_reference(df: pd.DataFrame, num_bins: int = NUM_BINS) -> dict:
+    """Precomputes one reference sketch per monitored feature."""
+    return {
+        feature: HistogramSketch.from_values(df[feature].to_numpy(), num_bins)
+        for feature in MONITORED_FEATURES
+        if feature in df.columns
+    }
+
+
+def save_reference(reference: dict, path=REFERENCE_SKETCH_PATH):
+    with open(path, "w") as f:
+        json.dump({feature: sketch.to_dict() for feature, sketch in reference.items()}, f)
+    logger.info(f"Saved drift reference for {list(reference)} to {path}")
+
+
+def load_reference(path=REFERENCE_SKETCH_PATH) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    return {feature: HistogramSketch.from_dict(sketch) for feature, sketch in data.items()}
+
+
+def load_drift_state(path=DRIFT_STATE_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def should_retrain(path=DRIFT_STATE_PATH) -> bool:
+    """
+    True if the last persisted drift evaluation flagged any feature. The state
+    only exists where ./data is shared with the stream processor, so with no
+    state (e.g. a fresh CI checkout) this fails open and says to retrain.
+    """
+    if not Path(path).exists():
+        logger.warning(f"No drift state at {path}, the drift gate only works where ./data is shared with the processor. Retraining.")
+        return True
+
+    state = load_drift_state(path)
+    return bool(state.get("drifted_features"))
+
+
+class DriftMonitor:
+    def __init__(self, reference_path=REFERENCE_SKETCH_PATH, state_path=DRIFT_STATE_PATH):
+        self.reference_path = Path(reference_path)
+        self.state_path = Path(state_path)
+        self.reference = {}
+        self.windows = {}
+        self.scores = {}
+        self._reference_mtime = None
+        self._since_evaluation = 0
+        self._last_drifted = []
+
+        self._load_reference()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.reference)
+
+    def _load_reference(self):
+        if not self.reference_path.exists():
+            # First run: derive the reference from the training set
+            try:
+                df = pd.read_parquet(REFERENCE_DATA_PATH, columns=MONITORED_FEATURES)
+                save_reference(build_reference(df), self.reference_path)
+            except Exception as e:
+                logger.warning(f"Drift monitoring disabled, no reference available: {e}")
+                return
+
+        try:
+            self.reference = load_reference(self.reference_path)
+            self._reference_mtime = self.reference_path.stat().st_mtime
+        except Exception as e:
+            logger.error(f"Failed to load drift reference: {e}")
+            return
+
+        # New reference means new bin edges, so the live windows start over
+        self.windows = {
+            feature: SlidingWindowSketch(sketch.edges)
+            for feature, sketch in self.reference.items()
+        }
+        self.scores = {}
+        logger.info(f"Drift monitor tracking {list(self.reference)} over {WINDOW_SECONDS}s windows")
+
+    def _reference_changed(self) -> bool:
+        try:
+            return self.reference_path.stat().st_mtime != self._reference_mtime
+        except FileNotFoundError:
+            return False
+
+    def update(self, payload: dict, now: float = None):
+        if not self.enabled:
+            return
+
+        now = now or time.time()
+        for feature, window in self.windows.items():
+            window.add(float(payload.get(feature, 0)), now)
+
+        self._since_evaluation += 1
+        if self._since_evaluation >= EVALUATE_EVERY:
+            self.evaluate(now)
+
+    def evaluate(self, now: float = None):
+        self._since_evaluation = 0
+        now = now or time.time()
+
+        #? train.py rewrites the reference after retraining
+        if self._reference_changed():
+            self._load_reference()
+            return self.scores
+
+        for feature, window in self.windows.items():
+            window.expire(now)
+            WINDOW_SAMPLES.labels(feature=feature).set(window.window.total)
+
+            #! Too few samples to judge, so forget any earlier score rather than keep reporting it
+            if window.window.total < MIN_WINDOW_SAMPLES:
+                self.scores.pop(feature, None)
+                DRIFT_SCORE.labels(feature=feature).set(float("nan"))
+                continue
+
+            score = population_stability_index(self.reference[feature], window.window)
+            self.scores[feature] = score
+            DRIFT_SCORE.labels(feature=feature).set(score)
+
+        drifted = self.drifted_features()
+        DRIFT_DETECTED.set(1 if drifted else 0)
+        #? Log transitions only, evaluation runs every EVALUATE_EVERY packets
+        if set(drifted) != set(self._last_drifted):
+            if drifted:
+                logger.warning(f"Drift detected in {drifted}: {self.scores}")
+            else:
+                logger.info(f"Drift cleared for {self._last_drifted}")
+            self._last_drifted = drifted
+
+        self._persist_state(now, drifted)
+        return self.scores
+
+    def drifted_features(self):
+        return [feature for feature, score in self.scores.items() if score > DRIFT_THRESHOLD]
+
+    def _persist_state(self, now: float, drifted):
+        state = {
+            "evaluated_at": now,
+            "threshold": DRIFT_THRESHOLD,
+            "scores": self.scores,
+            "drifted_features": drifted,
+            "windows": {feature: window.window.to_dict() for feature, window in self.windows.items()}
+        }
+        try:
+            tmp_path = self.state_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Failed to persist drift state: {e}")
@@ -2,14 +2,22 @@ import os
 import csv
 import json
 import redis
+import numpy as np
 import requests
 import pandas as pd
 from quixstreams import Application
 from feast import FeatureStore
+from prometheus_client import start_http_server
 from sentinel.logger import get_logger
+from sentinel.components.drift_monitor import DriftMonitor
+from sentinel.components.alert_aggregator import AlertAggregator
+from sentinel.utils.history_store import LIVE_COLUMNS
+from sentinel.utils.profiler import get_profiler
+from sentinel.utils.feature_pipeline import PACKET_PIPELINE
 
 logger = get_logger("StreamProcessor")
 API_URL = os.getenv("API_URL", "http://localhost:3000/predict")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8001"))
 
 class StreamProcessor:
     def __init__(self, topic_name="network-traffic", broker_addr: str =None):
@@ -32,22 +40,26 @@ class StreamProcessor:
             logger.error(f"Redis Connection Failed: {e}")
             self.redis_client = None
 
-    def log_training_data(self, payload):
+        self.drift_monitor = DriftMonitor()
+        self.profiler = get_profiler("StreamProcessor")
+        self.alerts = AlertAggregator()
+
+    def log_training_data(self, payload, packet_id, event_timestamp):
         directory = "/app/data"
         file_path = f"{directory}/live_traffic.csv"
         
-        # TODO: In a real time system, we need to save all the columns
-        columns = ["src_bytes", "dst_bytes", "duration", "count", "srv_count"]
+        #? history_store compacts these rows into date/hour partitions
+        row = {**payload, "packet_id": packet_id, "event_timestamp": event_timestamp}
         
         try:
             file_exists = os.path.isfile(file_path)
             with open(file_path, "a", newline="", buffering=1) as f:
-                writer = csv.DictWriter(f, fieldnames=columns)
+                writer = csv.DictWriter(f, fieldnames=LIVE_COLUMNS)
                 
                 if not file_exists:
                     writer.writeheader()
             
-                writer.writerow(payload)
+                writer.writerow(row)
     
                 f.flush()
                 os.fsync(f.fileno())
@@ -82,41 +94,55 @@ class StreamProcessor:
     def process_message(self, message):
         try:
             simulated_ip = f"{message.get('protocol_type')}_{message.get('service')}"
-            real_count = self.get_real_time_count(simulated_ip)
+            with self.profiler.stage("redis_count"):
+                real_count = self.get_real_time_count(simulated_ip)
             
-            # Extract Features for model input
-            payload = {
-                "src_bytes": float(message.get("src_bytes", 0)),
-                "dst_bytes": float(message.get("dst_bytes", 0)),
-                "duration": float(message.get("duration", 0)),
-                "count": real_count,
-                "srv_count": float(message.get("srv_count", 0))
-            }
-
-            self.log_training_data(payload)
+            # Extract Features for model input (same compiled layout as training)
+            #? Zero-fill here: producers may omit fields the model needs.
+            #? float64 keeps the logged/sent values exact; the API casts to float32 for the model
+            values = PACKET_PIPELINE.transform((message,), fill_missing=True, overrides={"count": real_count}, dtype=np.float64)
+            payload = dict(zip(PACKET_PIPELINE.columns, values[0].tolist()))
+
+            packet_id = str(message.get("packet_id", "unknown"))
+            event_timestamp = pd.Timestamp.now()
+
+            with self.profiler.stage("log_training_data"):
+                self.log_training_data(payload, packet_id, event_timestamp)
+            with self.profiler.stage("drift_update"):
+                self.drift_monitor.update(payload)
             
             # Push to Feast 
             #? Feast expects a list of dictionaries or a DataFrame
             feature_row = payload.copy()
-            feature_row["packet_id"] = str(message.get("packet_id", "unknown"))
-            feature_row["event_timestamp"] = pd.Timestamp.now()
+            feature_row["packet_id"] = packet_id
+            feature_row["event_timestamp"] = event_timestamp
             feature_row["protocol_type"] = str(message.get("protocol_type", "unknown"))
             feature_row["service"] = str(message.get("service", "unknown"))
             feature_row["flag"] = str(message.get("flag", "unknown"))
             
-            self.fs.push("packet_push_source", pd.DataFrame([feature_row]))
+            with self.profiler.stage("feast_push"):
+                self.fs.push("packet_push_source", pd.DataFrame([feature_row]))
 
-            response = requests.post(API_URL, json={"req": payload})
+            with self.profiler.stage("api_predict"):
+                response = requests.post(API_URL, json={"req": payload})
             
             if response.status_code == 200:
                 result = response.json()
                 pred = result["prediction"]
                 res = result["score"]
 
-                self.log_prediction(feature_row["packet_id"], feature_row["event_timestamp"], pred, res)
+                with self.profiler.stage("log_prediction"):
+                    self.log_prediction(feature_row["packet_id"], feature_row["event_timestamp"], pred, res)
                 
                 if pred == "Anomaly":
-                    logger.error(f"ALERT! Anomaly Detected in Packet {feature_row['packet_id']}! Score: {res}")
+                    #? One summarized alert per source/service/flag window instead of one per packet
+                    with self.profiler.stage("alert_record"):
+                        self.alerts.record(
+                            source=str(message.get("src_ip") or feature_row["protocol_type"]),
+                            service=feature_row["service"],
+                            flag=feature_row["flag"],
+                            packet_id=feature_row["packet_id"]
+                        )
                 else:
                     logger.info(f"Packet {feature_row['packet_id']} is Normal")
             else:
@@ -128,9 +154,13 @@ class StreamProcessor:
 
     def start(self):
         logger.info("Starting Stream Processor")
+        start_http_server(METRICS_PORT) #? Exposes drift scores to Prometheus
         sdf = self.app.dataframe(self.topic)
         sdf = sdf.update(self.process_message)
-        self.app.run()
+        try:
+            self.app.run()
+        finally:
+            self.alerts.close() # Write out any open alert windows
 
 if __name__ == "__main__":
     #! Note: Run the data_ingestion.py script in a separate terminal
@@ -0,0 +1,187 @@
+import os
+import time
+import argparse
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import bentoml
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sentinel.logger import get_logger
+from sentinel.utils.history_store import HISTORY_DIR, open_history
+from sentinel.utils.feature_pipeline import PACKET_PIPELINE, MODEL_FEATURES
+
+logger = get_logger("BatchScoring")
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_DIR = BASE_DIR / "data"
+DEFAULT_INPUT = DATA_DIR / "kdd_train.parquet"
+DEFAULT_MODEL_TAG = "sentinel_model:latest"
+DEFAULT_CHUNK_SIZE = 100_000
+
+FEATURES = MODEL_FEATURES
+#? Passed through to the output (when present) so predictions can be joined back
+KEEP_COLUMNS = ["packet_id", "event_timestamp"]
+
+#! Fixed, so every chunk matches the file schema whatever pandas infers for the input
+OUTPUT_SCHEMA = pa.schema([
+    pa.field("row_id", pa.int64()),
+    pa.field("packet_id", pa.string()),
+    pa.field("event_timestamp", pa.timestamp("us")),
+    pa.field("prediction", pa.string()),
+    pa.field("score", pa.int8()),
+    pa.field("anomaly_score", pa.float32()),
+])
+
+# Per-process model, loaded once by the pool initializer
+_model = None
+
+
+def _init_worker(model_tag: str):
+    global _model
+    _model = bentoml.sklearn.load_model(model_tag)
+
+    #! The pool already uses every core, nested joblib threads would oversubscribe
+    if hasattr(_model, "n_jobs"):
+        _model.n_jobs = 1
+
+
+def _score_chunk(vectors: np.ndarray):
+    anomaly_scores = _model.score_samples(vectors)  # Lower = more anomalous
+    #? Same rule as IsolationForest.predict, without walking the trees a second time
+    predictions = np.where(anomaly_scores - _model.offset_ < 0, -1, 1)
+    return predictions.astype(np.int8), anomaly_scores.astype(np.float32)
+
+
+def resolve_model_tag(model_tag: str) -> str:
+    """Pins tags like 'sentinel_model:latest' so every worker scores with the same version."""
+    return str(bentoml.models.get(model_tag).tag)
+
+
+def iter_chunks(input_path, chunk_size: int = DEFAULT_CHUNK_SIZE, csv_columns=None):
+    """Streams the input as DataFrames holding the model features plus any passthrough columns."""
+    if str(input_path) == "live":
+        input_path = HISTORY_DIR
+    input_path = Path(input_path)
+
+    if input_path.suffix == ".csv":
+        header = None if csv_columns else "infer"
+        columns = csv_columns or list(pd.read_csv(input_path, nrows=0).columns)
+        usecols = [c for c in FEATURES + KEEP_COLUMNS if c in columns]
+        reader = pd.read_csv(
+            input_path,
+            names=csv_columns,
+            header=header,
+            usecols=usecols,
+            dtype={"packet_id": str} if "packet_id" in usecols else None,
+            chunksize=chunk_size
+        )
+        yield from reader
+        return
+
+    if input_path.resolve() == HISTORY_DIR.resolve():
+        dataset = open_history()
+    elif input_path.is_dir():
+        dataset = ds.dataset(str(input_path), format="parquet", partitioning="hive")
+    else:
+        dataset = ds.dataset(str(input_path), format="parquet")
+
+    columns = [c for c in FEATURES + KEEP_COLUMNS if c in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _to_table(chunk: pd.DataFrame, row_offset: int, predictions: np.ndarray, anomaly_scores: np.ndarray) -> pa.Table:
+    rows = len(chunk)
+
+    if "packet_id" in chunk.columns:
+        packet_id = pa.array(chunk["packet_id"].astype("string"), type=pa.string(), from_pandas=True)
+    else:
+        packet_id = pa.nulls(rows, pa.string())
+
+    if "event_timestamp" in chunk.columns:
+        timestamps = pd.to_datetime(chunk["event_timestamp"], errors="coerce", utc=True).dt.tz_localize(None)
+        event_timestamp = pa.array(timestamps.astype("datetime64[us]"), type=pa.timestamp("us"), from_pandas=True)
+    else:
+        event_timestamp = pa.nulls(rows, pa.timestamp("us"))
+
+    return pa.Table.from_arrays(
+        [
+            pa.array(np.arange(row_offset, row_offset + rows, dtype=np.int64)),
+            packet_id,
+            event_timestamp,
+            pa.array(np.where(predictions == -1, "Anomaly", "Normal"), type=pa.string()),
+            pa.array(predictions, type=pa.int8()),
+            pa.array(anomaly_scores, type=pa.float32()),
+        ],
+        schema=OUTPUT_SCHEMA
+    )
+
+
+def batch_score(input_path, output_path, model_tag: str = DEFAULT_MODEL_TAG, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None, csv_columns=None) -> int:
+    workers = workers or os.cpu_count() or 1
+    model_tag = resolve_model_tag(model_tag)
+    logger.info(f"Scoring {input_path} with {model_tag} on {workers} workers")
+
+    start_time = time.time()
+    total = 0
+    pending = deque()  # (chunk, row_offset, future), in input order
+
+    #? Opened upfront so an empty input still produces a file with the schema
+    writer = pq.ParquetWriter(
+        output_path,
+        OUTPUT_SCHEMA.with_metadata({"model_tag": model_tag}),
+        compression="zstd"
+    )
+
+    def write_oldest():
+        nonlocal total
+        chunk, row_offset, future = pending.popleft()
+        predictions, anomaly_scores = future.result()
+        table = _to_table(chunk, row_offset, predictions, anomaly_scores)
+        writer.write_table(table)
+
+        total += table.num_rows
+        logger.info(f"Scored {total} rows ({total / max(time.time() - start_time, 1e-9):.0f} rows/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_tag,)) as pool:
+            row_offset = 0
+            for chunk in iter_chunks(input_path, chunk_size, csv_columns):
+                vectors = PACKET_PIPELINE.transform_frame(chunk, fill_missing=True)
+                pending.append((chunk.drop(columns=FEATURES), row_offset, pool.submit(_score_chunk, vectors)))
+                row_offset += len(chunk)
+
+                #? Bound in-flight chunks so memory stays flat on huge inputs
+                if len(pending) >= 2 * workers:
+                    write_oldest()
+
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+
+    logger.info(f"Wrote {total} predictions to {output_path} in {time.time() - start_time:.1f}s")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a historical dataset in bulk against a pinned Sentinel model.")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="Parquet file/directory, CSV file, or 'live' for the partitioned live history")
+    parser.add_argument("--output", required=True, help="Output Parquet file")
+    parser.add_argument("--model", default=DEFAULT_MODEL_TAG, help="BentoML model tag")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to the number of CPUs")
+    parser.add_argument("--csv-columns", default=None, help="Comma separated column names for headerless CSV input")
+    args = parser.parse_args()
+
+    csv_columns = args.csv_columns.split(",") if args.csv_columns else None
+    batch_score(args.input, args.output, args.model, args.chunk_size, args.workers, csv_columns)
+
+
+if __name__ == "__main__":
+    main()
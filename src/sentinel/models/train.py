@@ -5,22 +5,21 @@ import pandas as pd
 from pathlib import Path
 from sklearn.ensemble import IsolationForest
 from sentinel.logger import get_logger
+from sentinel.components.drift_monitor import build_reference, save_reference, should_retrain
+from sentinel.utils.history_store import compact_live_traffic, read_history
+from sentinel.utils.feature_pipeline import PACKET_PIPELINE, MODEL_FEATURES
 
 logger = get_logger("ModelTraining")
 
 BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = BASE_DIR / "data"
 OLD_DATA_PATH = DATA_DIR / "kdd_train.parquet"
-NEW_DATA_PATH = DATA_DIR / "live_traffic.csv"
+#! Only meaningful where ./data is shared with the stream processor (docker compose host).
+#! CI checkouts have no drift state, so there the gate always retrains.
+RETRAIN_ON_DRIFT_ONLY = os.getenv("RETRAIN_ON_DRIFT_ONLY", "false").lower() == "true"
 
-#? I'll use numerical features for my Isolation Forest
-FEATURES = [
-    "src_bytes",
-    "dst_bytes",
-    "duration",
-    "count",
-    "srv_count"
-]
+#? I'll use numerical features for my Isolation Forest (the float32 fields of packet_stats)
+FEATURES = MODEL_FEATURES
 
 def load_combined_data():
     combined_df = pd.DataFrame()
@@ -29,8 +28,7 @@ def load_combined_data():
     if os.path.exists(OLD_DATA_PATH):
         logger.info(f"Loading old data from {OLD_DATA_PATH}")
         try:
-            df_history = pd.read_parquet(OLD_DATA_PATH)
-            df_history = df_history[FEATURES]
+            df_history = pd.read_parquet(OLD_DATA_PATH, columns=FEATURES)
             combined_df = pd.concat([combined_df, df_history], ignore_index=True)
             logger.info(f"Added {len(df_history)} old records")
         except Exception as e:
@@ -39,21 +37,17 @@ def load_combined_data():
         logger.warning(f"Old data not found at {OLD_DATA_PATH}")
 
     # Load new data
-    if os.path.exists(NEW_DATA_PATH):
-        logger.info(f"Loading Live Traffic from {NEW_DATA_PATH}")
-        try:
-            # The CSV has headers because we wrote them in the processor
-            df_live = pd.read_csv(NEW_DATA_PATH)
-            if list(df_live.columns) != FEATURES:
-                df_live.columns = FEATURES
-                
-            df_live = df_live[FEATURES]
+    #? Roll any fresh live rows into the partitioned store, then read only the feature columns
+    try:
+        compact_live_traffic()
+        df_live = read_history(columns=FEATURES)
+        if df_live.empty:
+            logger.info("No live data found!")
+        else:
             combined_df = pd.concat([combined_df, df_live], ignore_index=True)
             logger.info(f"Added {len(df_live)} new live records")
-        except Exception as e:
-            logger.error(f"Failed to load live data: {e}")
-    else:
-        logger.info("No live data found!")
+    except Exception as e:
+        logger.error(f"Failed to load live data: {e}")
 
     return combined_df
 
@@ -74,7 +68,7 @@ def train_model():
         random_state=42, 
         n_jobs=-1
     )
-    model.fit(X)
+    model.fit(PACKET_PIPELINE.transform_frame(X, fill_missing=True))
     
     # Save to BentoML
     logger.info("Saving model to BentoML Model Store")
@@ -93,5 +87,12 @@ def train_model():
     logger.info(f"Model saved: {bento_model.tag}")
     logger.info(f"Model path: {bento_model.path}")
 
+    # The data we just trained on becomes the new drift baseline
+    save_reference(build_reference(X))
+
 if __name__ == "__main__":
+    if RETRAIN_ON_DRIFT_ONLY and not should_retrain():
+        logger.info("No drift detected in live traffic. Skipping retraining.")
+        sys.exit(0)
+
     train_model()
\ No newline at end of file
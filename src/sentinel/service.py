@@ -1,8 +1,18 @@
+import os
 import bentoml
 import numpy as np
+from bentoml.exceptions import InvalidArgument, NotFound
 from sentinel.logger import get_logger
+from sentinel.utils.feature_pipeline import PACKET_PIPELINE
+from sentinel.utils.profiler import get_profiler, PROFILE_WINDOW
 
 logger = get_logger("APIService")
+#! Created per worker process. PID 1 in the API container is the `bentoml serve` supervisor,
+#! which serves no requests, so trigger windows through /profile (or `pkill -USR1 -f _bentoml_impl.worker`)
+profiler = get_profiler("APIService")
+#! /profile has no auth, so it is off unless explicitly enabled for the deployment
+PROFILE_ENDPOINT_ENABLED = os.getenv("SENTINEL_PROFILE_ENDPOINT", "false").lower() == "true"
+MAX_PROFILE_WINDOW = float(os.getenv("SENTINEL_PROFILE_MAX_WINDOW", "300"))
 
 @bentoml.service(name="sentinel_nids")
 class SentinelService:
@@ -14,23 +24,38 @@ class SentinelService:
         """
         Real-time Inference Endpoint.
         """
-        # Prepare Vector (Order must match with order during training)
-        features = [req["src_bytes"], req["dst_bytes"], req["duration"], req["count"], req["srv_count"]]
-        vector = np.array([features])
+        # Prepare Vector (same compiled layout as training)
+        with profiler.stage("vectorize"):
+            try:
+                values = PACKET_PIPELINE.transform((req,), dtype=np.float64)
+            except ValueError as e:
+                raise InvalidArgument(str(e))  # 400 instead of scoring malformed input
+            vector = values.astype(np.float32)
         
         # Prediction
         logger.info("Predicting anomaly for input vector")
-        prediction = self.model.predict(vector)
+        with profiler.stage("model_predict"):
+            prediction = self.model.predict(vector)
         result = "Anomaly" if prediction[0] == -1 else "Normal"
         
         return {
             "prediction": result,
             "score": int(prediction[0]),
-            "input_echo": {
-                "src_bytes": req["src_bytes"],
-                "dst_bytes": req["dst_bytes"],
-                "duration": req["duration"],
-                "count": req["count"],
-                "srv_count": req["srv_count"]
-            }
-        }
\ No newline at end of file
+            "input_echo": dict(zip(PACKET_PIPELINE.columns, values[0].tolist()))
+        }
+
+    @bentoml.api
+    def profile(self, seconds: float = PROFILE_WINDOW, mode: str = "stacks") -> dict:
+        """
+        Starts a profiling window in the worker serving this request.
+        Only available with SENTINEL_PROFILE_ENDPOINT=true.
+        """
+        if not PROFILE_ENDPOINT_ENABLED:
+            raise NotFound("Profiling endpoint is disabled")
+        if mode not in ("stacks", "cprofile"):
+            raise InvalidArgument("mode must be 'stacks' or 'cprofile'")
+        if not 0 < seconds <= MAX_PROFILE_WINDOW:
+            raise InvalidArgument(f"seconds must be in (0, {MAX_PROFILE_WINDOW}]")
+
+        started = profiler.start(seconds=seconds, mode=mode)
+        return {"started": started, "pid": os.getpid(), "seconds": seconds, "mode": mode}
\ No newline at end of file
@@ -0,0 +1,83 @@
+import itertools
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+#? Single source of truth for the `packet_stats` feature view. features/definitions.py
+#? builds its Feast schema from this, and the model consumes the float32 fields in order.
+PACKET_STATS_SCHEMA = [
+    ("src_bytes", "float32"),
+    ("dst_bytes", "float32"),
+    ("duration", "float32"),
+    ("count", "float32"),
+    ("srv_count", "float32"),
+    ("protocol_type", "string"),
+    ("service", "string"),
+    ("flag", "string"),
+]
+
+
+class FeaturePipeline:
+    """
+    Compiles a feature schema to a fixed float32 column layout. The same
+    instance vectorizes training frames, API requests and stream messages,
+    so the column order can't drift between them.
+    """
+
+    def __init__(self, schema=PACKET_STATS_SCHEMA):
+        self.columns = tuple(name for name, dtype in schema if dtype == "float32")
+        self.width = len(self.columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+        # itemgetter pulls every column in one C call instead of a Python loop of lookups
+        getter = itemgetter(*self.columns)
+        self._getter = getter if self.width > 1 else (lambda record: (getter(record),))
+
+    def _missing(self, records) -> list:
+        return sorted({column for record in records for column in self.columns if column not in record})
+
+    def _apply_null_policy(self, array: np.ndarray, fill_missing: bool) -> np.ndarray:
+        """Null/NaN fields are zero-filled when `fill_missing`, rejected otherwise."""
+        nulls = np.isnan(array)
+        if nulls.any():
+            if not fill_missing:
+                columns = sorted({self.columns[i] for i in np.nonzero(nulls)[1]})
+                raise ValueError(f"Null features: {columns}")
+            array[nulls] = 0
+        return array
+
+    def transform(self, records, fill_missing: bool = False, overrides: dict = None, dtype=np.float32) -> np.ndarray:
+        """
+        Decoded messages -> contiguous (n, width) array. Missing or null
+        fields raise ValueError unless `fill_missing`, which zero-fills them.
+        Non-numeric values always raise. `overrides` replaces whole columns.
+        """
+        if not isinstance(records, (list, tuple)):
+            records = list(records)
+
+        try:
+            rows = map(self._getter, records)
+            flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=dtype, count=len(records) * self.width)
+        except KeyError:
+            if not fill_missing:
+                raise ValueError(f"Missing features: {self._missing(records)}")
+            #? Slow path only for batches with missing fields; they become NaN, then 0 below
+            rows = ([record.get(column) for column in self.columns] for record in records)
+            flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=dtype, count=len(records) * self.width)
+        except TypeError as e:
+            raise ValueError(f"Non-numeric feature: {e}")
+
+        array = self._apply_null_policy(flat.reshape(len(records), self.width), fill_missing)
+
+        if overrides:
+            for name, value in overrides.items():
+                array[:, self._index[name]] = value
+
+        return array
+
+    def transform_frame(self, df: pd.DataFrame, fill_missing: bool = False) -> np.ndarray:
+        array = np.ascontiguousarray(df[list(self.columns)].to_numpy(dtype=np.float32))
+        return self._apply_null_policy(array, fill_missing)
+
+PACKET_PIPELINE = FeaturePipeline()
+MODEL_FEATURES = list(PACKET_PIPELINE.columns)
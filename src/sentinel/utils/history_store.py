@@ -0,0 +1,362 @@
+import io
+import os
+import json
+import time
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sentinel.logger import get_logger
+from sentinel.utils.feature_pipeline import MODEL_FEATURES
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, compaction runs unlocked
+    fcntl = None
+
+logger = get_logger("HistoryStore")
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_DIR = BASE_DIR / "data"
+LIVE_TRAFFIC_PATH = DATA_DIR / "live_traffic.csv"
+HISTORY_DIR = DATA_DIR / "history"
+CHECKPOINT_FILE = "_checkpoint.json"
+LOCK_FILE = "_compaction.lock"
+
+COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "300"))
+ROW_GROUP_SIZE = int(os.getenv("HISTORY_ROW_GROUP_SIZE", "64000"))
+READ_BLOCK_SIZE = 64 * 1024 * 1024  # 64MB of CSV per compaction step
+ROTATE_BYTES = int(os.getenv("LIVE_TRAFFIC_ROTATE_BYTES", str(256 * 1024 * 1024)))
+ROTATE_GRACE_SECONDS = 2
+#? Hours stay open a little past the top of the hour for late rows before being merged
+MERGE_GRACE_SECONDS = int(os.getenv("HISTORY_MERGE_GRACE_SECONDS", "600"))
+MERGED_FROM_KEY = b"sentinel.merged_from"
+
+FEATURE_COLUMNS = MODEL_FEATURES
+#? Column order of the rows the stream processor appends to live_traffic.csv
+LIVE_COLUMNS = FEATURE_COLUMNS + ["packet_id", "event_timestamp"]
+
+HISTORY_SCHEMA = pa.schema(
+    [pa.field(name, pa.float32()) for name in FEATURE_COLUMNS] + [
+        pa.field("packet_id", pa.string()),
+        pa.field("event_timestamp", pa.timestamp("us")),
+    ]
+)
+#! Zero-padded strings, so lexicographic comparison is chronological
+PARTITION_SCHEMA = pa.schema([pa.field("date", pa.string()), pa.field("hour", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+def _load_checkpoint(history_dir: Path) -> dict:
+    try:
+        with open(history_dir / CHECKPOINT_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_checkpoint(history_dir: Path, checkpoint: dict):
+    tmp_path = history_dir / f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, history_dir / CHECKPOINT_FILE)
+
+
+def _parse_live_rows(raw: bytes, compacted_at: datetime) -> pd.DataFrame:
+    df = pd.read_csv(io.BytesIO(raw), names=LIVE_COLUMNS, header=None, dtype=str)
+
+    # Drop header lines the processor writes when it creates a fresh file
+    for column in FEATURE_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df = df.dropna(subset=["src_bytes"])
+
+    df[FEATURE_COLUMNS] = df[FEATURE_COLUMNS].fillna(0).astype("float32")
+    df["packet_id"] = df["packet_id"].fillna("unknown")
+
+    #? Legacy rows predate the timestamp column, so they land in the compaction hour
+    df["event_timestamp"] = pd.to_datetime(df["event_timestamp"], errors="coerce").fillna(compacted_at)
+    return df
+
+
+@contextmanager
+def _compaction_lock(history_dir: Path):
+    """Serializes compaction between the compactor service and train.py."""
+    with open(history_dir / LOCK_FILE, "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_partitions(df: pd.DataFrame, history_dir: Path, file_stem: str) -> int:
+    written = 0
+    hours = df["event_timestamp"].dt.floor("h")
+
+    for hour, part in df.groupby(hours):
+        partition_dir = history_dir / f"date={hour:%Y-%m-%d}" / f"hour={hour:%H}"
+        partition_dir.mkdir(parents=True, exist_ok=True)
+
+        # Sorting keeps row-group min/max statistics on event_timestamp tight
+        part = part.sort_values("event_timestamp")
+        table = pa.Table.from_pandas(part[LIVE_COLUMNS], schema=HISTORY_SCHEMA, preserve_index=False)
+
+        #! Named after the source block, so re-running a block after a crash overwrites instead of duplicating
+        file_name = f"{file_stem}.parquet"
+        tmp_path = partition_dir / f".{file_name}.tmp"
+        pq.write_table(
+            table,
+            tmp_path,
+            row_group_size=ROW_GROUP_SIZE,
+            compression="zstd",
+            write_statistics=True
+        )
+        os.replace(tmp_path, partition_dir / file_name)
+        written += len(part)
+
+    return written
+
+
+def compact_live_traffic(source_path=LIVE_TRAFFIC_PATH, history_dir=HISTORY_DIR) -> int:
+    """
+    Rolls rows appended to the live CSV since the last run into the
+    date/hour partitioned Parquet dataset, rotating the CSV away once it
+    passes ROTATE_BYTES. Returns the number of rows written.
+    """
+    source_path, history_dir = Path(source_path), Path(history_dir)
+    rotated_path = source_path.with_name(f"{source_path.name}.rotated")
+    if not source_path.exists() and not rotated_path.exists():
+        logger.info(f"No live traffic to compact at {source_path}")
+        return 0
+
+    history_dir.mkdir(parents=True, exist_ok=True)
+    with _compaction_lock(history_dir):
+        total = 0
+
+        # A crash mid-rotation leaves the rotated file behind, still tracked by the checkpoint
+        if rotated_path.exists():
+            total += _compact_locked(rotated_path, history_dir)
+            _finish_rotation(rotated_path, history_dir)
+
+        if source_path.exists():
+            total += _compact_locked(source_path, history_dir)
+
+            if source_path.stat().st_size >= ROTATE_BYTES:
+                #? The processor reopens the CSV per row, so its next write starts a fresh file
+                os.replace(source_path, rotated_path)
+                time.sleep(ROTATE_GRACE_SECONDS)  # Lets appends already holding the old file land
+                total += _compact_locked(rotated_path, history_dir)
+                _finish_rotation(rotated_path, history_dir)
+
+        logger.info(f"Compacted {total} live rows into {history_dir}")
+        return total
+
+
+def _finish_rotation(rotated_path: Path, history_dir: Path):
+    checkpoint = _load_checkpoint(history_dir)
+
+    #! Unlink before resetting the offset: if we crash in between, the new CSV is
+    #! smaller than the stale offset and the shrink check below restarts it cleanly
+    rotated_path.unlink()
+    _save_checkpoint(history_dir, {
+        **checkpoint,
+        "offset": 0,
+        "generation": checkpoint.get("generation", 0) + 1
+    })
+    logger.info(f"Rotated {rotated_path.name} out after compaction")
+
+
+def _compact_locked(source_path: Path, history_dir: Path) -> int:
+    checkpoint = _load_checkpoint(history_dir)
+    offset = checkpoint.get("offset", 0)
+    generation = checkpoint.get("generation", 0)
+
+    size = source_path.stat().st_size
+    if size < offset:
+        logger.warning("Live traffic file shrank since last compaction. Starting from the beginning.")
+        offset = 0
+        generation += 1  # Keeps new block file names from clobbering the old file's
+
+    compacted_at = datetime.now()
+    total = 0
+
+    with open(source_path, "rb") as f:
+        f.seek(offset)
+        while offset < size:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+
+            #! Only consume complete lines, the processor may be mid-write
+            end = block.rfind(b"\n") + 1
+            if end == 0:
+                break
+
+            df = _parse_live_rows(block[:end], compacted_at)
+            if not df.empty:
+                total += _write_partitions(df, history_dir, f"part-g{generation}-{offset:020d}")
+
+            offset += end
+            f.seek(offset)
+            _save_checkpoint(history_dir, {
+                "offset": offset,
+                "generation": generation,
+                "compacted_at": compacted_at.isoformat()
+            })
+
+    return total
+
+
+def _closed_partitions(history_dir: Path, now: datetime):
+    """Yields hour partitions that can no longer receive live rows."""
+    cutoff = pd.Timestamp(now) - pd.Timedelta(seconds=MERGE_GRACE_SECONDS)
+    for partition_dir in sorted(history_dir.glob("date=*/hour=*")):
+        date = partition_dir.parent.name.split("=", 1)[1]
+        hour = partition_dir.name.split("=", 1)[1]
+        try:
+            partition_end = pd.Timestamp(f"{date} {hour}:00") + pd.Timedelta(hours=1)
+        except ValueError:
+            continue
+        if partition_end <= cutoff:
+            yield partition_dir
+
+
+def _merge_partition(partition_dir: Path) -> int:
+    parts = sorted(p for p in partition_dir.glob("*.parquet") if not p.name.startswith((".", "_")))
+
+    # Drop sources a previous merge already absorbed but crashed before deleting
+    for part in parts:
+        if part.name.startswith("merged-") and part.exists():
+            metadata = pq.read_schema(part).metadata or {}
+            absorbed = json.loads(metadata.get(MERGED_FROM_KEY, b"[]"))
+            for name in absorbed:
+                (partition_dir / name).unlink(missing_ok=True)
+    parts = [p for p in parts if p.exists()]
+
+    if len(parts) <= 1:
+        return 0
+
+    table = pa.concat_tables(pq.read_table(p, schema=HISTORY_SCHEMA) for p in parts)
+    table = table.sort_by("event_timestamp")  # One sorted file gives tight, non-overlapping row groups
+
+    names = [p.name for p in parts]
+    merged_name = f"merged-{int(time.time() * 1000)}.parquet"
+    tmp_path = partition_dir / f".{merged_name}.tmp"
+    pq.write_table(
+        table.replace_schema_metadata({MERGED_FROM_KEY: json.dumps(names)}),
+        tmp_path,
+        row_group_size=ROW_GROUP_SIZE,
+        compression="zstd",
+        write_statistics=True
+    )
+    os.replace(tmp_path, partition_dir / merged_name)
+
+    for part in parts:
+        part.unlink()
+    return len(parts)
+
+
+def merge_closed_partitions(history_dir=HISTORY_DIR, now: datetime = None) -> int:
+    """
+    Rewrites every closed hour partition holding more than one file into a
+    single timestamp-sorted file. Returns the number of files merged away.
+    """
+    history_dir = Path(history_dir)
+    if not history_dir.exists():
+        return 0
+
+    merged = 0
+    with _compaction_lock(history_dir):
+        for partition_dir in _closed_partitions(history_dir, now or datetime.now()):
+            merged += _merge_partition(partition_dir)
+
+    if merged:
+        logger.info(f"Merged {merged} small files in closed hour partitions")
+    return merged
+
+
+def _time_filter(start: datetime = None, end: datetime = None):
+    """Partition predicates prune directories; the timestamp predicate prunes row groups."""
+    expr = None
+
+    if start is not None:
+        start = pd.Timestamp(start)
+        date, hour = start.strftime("%Y-%m-%d"), start.strftime("%H")
+        partition = (ds.field("date") > date) | ((ds.field("date") == date) & (ds.field("hour") >= hour))
+        expr = partition & (ds.field("event_timestamp") >= pa.scalar(start.to_pydatetime(), pa.timestamp("us")))
+
+    if end is not None:
+        end = pd.Timestamp(end)
+        date, hour = end.strftime("%Y-%m-%d"), end.strftime("%H")
+        partition = (ds.field("date") < date) | ((ds.field("date") == date) & (ds.field("hour") <= hour))
+        bound = partition & (ds.field("event_timestamp") < pa.scalar(end.to_pydatetime(), pa.timestamp("us")))
+        expr = bound if expr is None else expr & bound
+
+    return expr
+
+
+def open_history(history_dir=HISTORY_DIR) -> ds.Dataset:
+    return ds.dataset(
+        str(history_dir),
+        format="parquet",
+        schema=pa.unify_schemas([HISTORY_SCHEMA, PARTITION_SCHEMA]),  # Resolves columns even before any file exists
+        partitioning=PARTITIONING,
+        ignore_prefixes=[".", "_"]
+    )
+
+
+def scan_history(columns=None, start=None, end=None, filter=None, history_dir=HISTORY_DIR, batch_size=ROW_GROUP_SIZE):
+    """
+    Streams matching record batches. `filter` is an optional pyarrow
+    expression, e.g. ds.field("src_bytes") > 10000.
+    """
+    expr = _time_filter(start, end)
+    if filter is not None:
+        expr = filter if expr is None else expr & filter
+
+    if not Path(history_dir).exists():
+        return
+
+    dataset = open_history(history_dir)
+    if not dataset.files:
+        return
+
+    scanner = dataset.scanner(columns=columns, filter=expr, batch_size=batch_size)
+    yield from scanner.to_batches()
+
+
+def read_history(columns=None, start=None, end=None, filter=None, history_dir=HISTORY_DIR) -> pd.DataFrame:
+    """Reads only the partitions, row groups and columns needed for the query."""
+    empty = HISTORY_SCHEMA.empty_table().to_pandas()
+    if not Path(history_dir).exists():
+        return empty[columns] if columns else empty
+
+    dataset = open_history(history_dir)
+    if not dataset.files:
+        return empty[columns] if columns else empty
+
+    expr = _time_filter(start, end)
+    if filter is not None:
+        expr = filter if expr is None else expr & filter
+
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def run_compaction_loop(interval: int = COMPACTION_INTERVAL):
+    logger.info(f"Starting history compaction every {interval}s")
+    while True:
+        try:
+            compact_live_traffic()
+            merge_closed_partitions()
+        except Exception as e:
+            logger.error(f"Compaction failed: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    run_compaction_loop()
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import signal
+import marshal
+import cProfile
+import itertools
+import threading
+from pathlib import Path
+from collections import Counter
+from sentinel.logger import get_logger
+
+logger = get_logger("Profiler")
+
+#? SENTINEL_PROFILE=true profiles one window at startup; `kill -USR1 <pid>` profiles one on demand
+#? (signal the process that does the work: the processor itself, or the BentoML worker, not the supervisor)
+PROFILE_ON_START = os.getenv("SENTINEL_PROFILE", "false").lower() == "true"
+PROFILE_MODE = os.getenv("SENTINEL_PROFILE_MODE", "stacks")  # "stacks" or "cprofile"
+PROFILE_WINDOW = float(os.getenv("SENTINEL_PROFILE_WINDOW", "30"))
+PROFILE_SAMPLE_RATE = float(os.getenv("SENTINEL_PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_STACK_INTERVAL = float(os.getenv("SENTINEL_PROFILE_STACK_INTERVAL", "0.01"))
+PROFILE_DIR = Path(os.getenv("SENTINEL_PROFILE_DIR", "profiles"))
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _StageTimer:
+    __slots__ = ("profiler", "name", "wall", "cpu")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+
+class Profiler:
+    """
+    Opt-in profiling window. While inactive, `stage()` costs a couple of
+    attribute checks. While active, every Nth stage is timed (wall + CPU) and either a
+    background thread samples all thread stacks into a collapsed-stack
+    flamegraph file, or cProfile runs on the thread doing the work.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.active = False
+        self._lock = threading.RLock()  #! Re-entrant: the signal handler runs on the thread it interrupts
+        self._calls = itertools.count()
+        self._sample_every = max(1, round(1 / PROFILE_SAMPLE_RATE)) if PROFILE_SAMPLE_RATE > 0 else sys.maxsize
+        self._stats = {}
+        self._stacks = Counter()
+        self._deadline = 0.0
+        self._window = 0
+        self._mode = None
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._cprofile = None
+        self._cprofile_thread = None
+        self._lingering = None  # (profile, thread id) still hooked after a window closed elsewhere
+
+    def stage(self, name: str):
+        if not self.active:
+            if self._lingering is not None:
+                self._release_lingering()
+            return _NOOP
+
+        if self._cprofile is not None:
+            self._step_cprofile()
+            if not self.active:
+                return _NOOP
+
+        if next(self._calls) % self._sample_every:
+            return _NOOP
+
+        return _StageTimer(self, name)
+
+    def _record(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {"samples": 0, "wall_total": 0.0, "cpu_total": 0.0, "wall_max": 0.0}
+            stats["samples"] += 1
+            stats["wall_total"] += wall
+            stats["cpu_total"] += cpu
+            stats["wall_max"] = max(stats["wall_max"], wall)
+
+    def start(self, seconds: float = PROFILE_WINDOW, mode: str = PROFILE_MODE) -> bool:
+        with self._lock:
+            if self.active:
+                logger.warning(f"[{self.name}] Profiling window already running")
+                return False
+
+            self._stats = {}
+            self._stacks = Counter()
+            self._mode = mode
+            self._deadline = time.monotonic() + seconds
+            self._window += 1
+            self._stop_event.clear()
+
+            if mode == "cprofile":
+                #? cProfile only hooks the thread that enables it, so the next stage() call does that
+                self._cprofile = cProfile.Profile()
+                self._cprofile_thread = None
+                self._lingering = None
+            else:
+                self._sampler = threading.Thread(target=self._sample_stacks, daemon=True)
+                self._sampler.start()
+
+            #! Closes the window even if traffic stalls and no stage() call sees the deadline
+            timer = threading.Timer(seconds, self._expire, args=(self._window,))
+            timer.daemon = True
+            timer.start()
+
+            self.active = True
+
+        logger.info(f"[{self.name}] Profiling for {seconds}s in '{mode}' mode")
+        return True
+
+    def _step_cprofile(self):
+        me = threading.get_ident()
+        if self._cprofile_thread is None:
+            with self._lock:
+                if self._cprofile_thread is None:
+                    self._cprofile_thread = me
+                    self._cprofile.enable()
+        elif self._cprofile_thread == me and time.monotonic() >= self._deadline:
+            self.stop()
+
+    def _expire(self, window: int):
+        with self._lock:
+            # The window may already have closed early and a new one started since
+            if window == self._window:
+                self.stop()
+
+    def _release_lingering(self):
+        """cProfile can only be unhooked from its own thread, so the next stage() call there does it."""
+        profile, thread_id = self._lingering
+        if thread_id == threading.get_ident():
+            profile.disable()
+            self._lingering = None
+
+    def _sample_stacks(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(PROFILE_STACK_INTERVAL):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+
+            self._stop_event.set()
+            if self._sampler is not None and self._sampler is not threading.current_thread():
+                self._sampler.join()
+            self._sampler = None
+
+            try:
+                self._dump()
+            except Exception as e:
+                logger.error(f"[{self.name}] Failed to write profile: {e}")
+            finally:
+                self._cprofile = None
+                self._cprofile_thread = None
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "samples": s["samples"],
+                    "estimated_calls": s["samples"] * self._sample_every,
+                    "wall_ms_avg": 1000 * s["wall_total"] / s["samples"],
+                    "cpu_ms_avg": 1000 * s["cpu_total"] / s["samples"],
+                    "wall_ms_max": 1000 * s["wall_max"],
+                }
+                for name, s in self._stats.items()
+            }
+
+    def _dump(self):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        #? Window counter keeps two short windows in the same second from overwriting each other
+        prefix = PROFILE_DIR / f"{self.name}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}-w{self._window}"
+
+        summary = self.summary()
+        with open(f"{prefix}.timings.json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        for name, s in summary.items():
+            logger.info(f"[{self.name}] {name}: wall {s['wall_ms_avg']:.3f}ms avg / {s['wall_ms_max']:.3f}ms max, cpu {s['cpu_ms_avg']:.3f}ms avg")
+
+        if self._cprofile is not None and self._cprofile_thread is not None:
+            if self._cprofile_thread == threading.get_ident():
+                self._cprofile.disable()
+            else:
+                self._lingering = (self._cprofile, self._cprofile_thread)
+
+            # snapshot_stats reads the collected data without unhooking, so it is safe from the timer thread
+            self._cprofile.snapshot_stats()
+            with open(f"{prefix}.prof", "wb") as f:
+                marshal.dump(self._cprofile.stats, f)
+            logger.info(f"[{self.name}] cProfile written to {prefix}.prof")
+
+        if self._stacks:
+            #? Collapsed format: feed straight into flamegraph.pl or speedscope
+            with open(f"{prefix}.collapsed", "w") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"[{self.name}] Flamegraph stacks written to {prefix}.collapsed")
+
+
+_profilers = {}
+
+
+def get_profiler(name: str = "sentinel") -> Profiler:
+    """
+    Returns the process-wide profiler for `name`, registering the SIGUSR1
+    trigger the first time (only possible from the main thread).
+    """
+    if name in _profilers:
+        return _profilers[name]
+
+    profiler = _profilers[name] = Profiler(name)
+
+    sigusr1 = getattr(signal, "SIGUSR1", None)  # Not available on Windows
+    if sigusr1 is not None:
+        try:
+            signal.signal(sigusr1, lambda signum, frame: profiler.start())
+        except ValueError:
+            logger.warning(f"[{name}] Not on the main thread, SIGUSR1 profiling trigger unavailable")
+
+    if PROFILE_ON_START:
+        profiler.start()
+
+    return profiler